@@ -1,18 +1,76 @@
 import time
+import hashlib
+import logging
 import uuid
-import concurrent.futures
+import asyncio
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from operator import attrgetter
 from typing import List, Optional
-from fastapi import FastAPI, BackgroundTasks, HTTPException
-from fastapi.responses import HTMLResponse
-from pydantic import BaseModel
+import numpy as np
+from cachetools import LRUCache, TTLCache
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import HTMLResponse, ORJSONResponse
+from pydantic import BaseModel, Field
+from google.api import metric_pb2
 from google.api_core import exceptions
 from google.cloud import monitoring_v3, firestore
+from google.cloud.monitoring_v3.services.metric_service.transports import MetricServiceGrpcAsyncIOTransport
 from datetime import datetime
 
-app = FastAPI(title="SLA Dashboard")
-monitoring_client = monitoring_v3.MetricServiceClient()
+logger = logging.getLogger(__name__)
+
+# Ping the Monitoring connection while RPCs are in flight so one that silently died (e.g. dropped
+# by a NAT or load balancer) fails within keepalive_timeout_ms instead of hanging a long listing.
+# No pings are sent between reports: an idle channel still reconnects on its next RPC.
+GRPC_CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.http2.max_pings_without_data", 0),
+]
+
+
+def _monitoring_channel(host, options=(), **kwargs):
+    return MetricServiceGrpcAsyncIOTransport.create_channel(host, options=[*options, *GRPC_CHANNEL_OPTIONS], **kwargs)
+
+
+monitoring_client = monitoring_v3.MetricServiceAsyncClient(
+    transport=MetricServiceGrpcAsyncIOTransport(channel=_monitoring_channel))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the Monitoring connection during startup so the first report doesn't pay the handshake;
+    # a slow or failed warm-up only means that first report connects lazily as before
+    try:
+        await asyncio.wait_for(monitoring_client.transport.grpc_channel.channel_ready(), timeout=5)
+    except Exception:
+        pass
+    yield
+
+
+app = FastAPI(title="SLA Dashboard", lifespan=lifespan)
 db = firestore.Client()
 COLLECTION_NAME = "sla_reports"
+REPORT_LIST_FIELDS = ["job_id", "status", "started_at", "finished_at", "days"]
+REPORT_BUCKET_SECONDS = 300  # report windows snap to this grid so repeated runs hit the series cache
+SERIES_CACHE_BYTES = 64 * 1024 * 1024
+# Bounded by array bytes, not entries: one cold 30-day batch can hold tens of MB of per-minute counts
+series_cache = TTLCache(maxsize=SERIES_CACHE_BYTES, ttl=REPORT_BUCKET_SECONDS,
+                        getsizeof=lambda arrays: sum(a.nbytes for a in arrays.values()))
+inflight_fetches = {}  # series_cache key -> Task, so identical concurrent fetches share one RPC
+running_jobs = set()  # strong refs so in-flight report tasks are not garbage collected
+pending_jobs = {}  # job_id -> job doc, held in memory until its single Firestore write
+unsaved_reports = LRUCache(maxsize=64)  # finished jobs whose Firestore write failed, served from memory
+# Dashboard polling reads: the recent-reports listing is cached briefly, finished reports never change
+report_list_cache = TTLCache(maxsize=1, ttl=5)
+report_list_generation = 0  # bumped on every report save, so listings read before it aren't cached
+finished_reports = LRUCache(maxsize=256)
+CACHE_COLLECTION_NAME = "sla_cache"
+DAY_SECONDS = 24 * 60 * 60
+COUNT_DTYPE = np.uint32  # per-minute request counts, in memory and in sla_cache docs
+CACHE_SETTLE_SECONDS = 60 * 60  # Monitoring data older than this is treated as final and cached per day
 
 
 # --- Pydantic Models ---
@@ -31,47 +89,212 @@ class ProjectConfig(BaseModel):
 class ReportRequest(BaseModel):
     projects: List[ProjectConfig]
     days: int = 30
-    max_workers: int = 10
+    max_workers: int = Field(10, ge=1)
+
+
+# --- Service Metric Configs ---
+
+# filter_tpl is formatted with the quoted, comma-separated service names of one batch.
+# Series are split per service by name_label (absent for project-scoped metrics) and
+# classified as errors by status_label, matching error_value or not matching success_value.
+SERVICE_CONFIGS = {
+    'cloud_run_revision': {
+        'total_metric': 'run.googleapis.com/request_count',
+        'filter_tpl': 'resource.type="cloud_run_revision" AND resource.labels.service_name=one_of({names})',
+        'name_label': 'service_name',
+        'status_label': 'response_code_class',
+        'error_value': '5xx'
+    },
+    'gcs_bucket': {
+        'total_metric': 'storage.googleapis.com/api/request_count',
+        'filter_tpl': 'resource.type="gcs_bucket" AND resource.labels.bucket_name=one_of({names})',
+        'name_label': 'bucket_name',
+        'status_label': 'response_code',
+        'error_value': '500'
+    },
+    'bigquery_project': {
+        'total_metric': 'bigquery.googleapis.com/query/count',
+        'filter_tpl': 'resource.type="bigquery_project"',
+        'status_label': 'state',
+        'success_value': 'SUCCEEDED'
+    }
+}
 
 
 # --- Core Logic Functions ---
 
-def fetch_aligned_series(project_id, start_time, end_time, full_filter):
-    """Fetches 1-minute aligned sums from Cloud Monitoring."""
-    project_name = f"projects/{project_id}"
-    start_time = int(start_time) - (int(start_time) % 60)
-    end_time = int(end_time) - (int(end_time) % 60)
-
-    interval = monitoring_v3.TimeInterval({
-        "end_time": {"seconds": int(end_time)},
-        "start_time": {"seconds": int(start_time)},
+@lru_cache(maxsize=32)
+def _time_interval(start_time, end_time):
+    """Builds the TimeInterval proto once per report window; it is shared by every fetch of that window."""
+    return monitoring_v3.TimeInterval({
+        "end_time": {"seconds": end_time},
+        "start_time": {"seconds": start_time},
     })
 
-    aggregation = monitoring_v3.Aggregation({
+
+@lru_cache(maxsize=32)
+def _aggregation(group_by_fields):
+    """Builds the 1-minute ALIGN_SUM Aggregation proto, summed across series per `group_by_fields` when given."""
+    aggregation = {
         "alignment_period": {"seconds": 60},
         "per_series_aligner": monitoring_v3.Aggregation.Aligner.ALIGN_SUM,
-    })
+    }
+    if group_by_fields:
+        aggregation["cross_series_reducer"] = monitoring_v3.Aggregation.Reducer.REDUCE_SUM
+        aggregation["group_by_fields"] = list(group_by_fields)
+    return monitoring_v3.Aggregation(aggregation)
 
+
+async def fetch_aligned_series(project_id, start_time, end_time, full_filter, group_by_fields=()):
+    """Fetches 1-minute aligned sums from Cloud Monitoring as per-minute COUNT_DTYPE arrays, keyed by the tuple of `group_by_fields` label values.
+
+    `start_time` and `end_time` are epoch seconds already aligned to the minute.
+    """
+    group_by_fields = tuple(group_by_fields)
+    cache_key = (project_id, full_filter, start_time, end_time, group_by_fields)
+    data_points = series_cache.get(cache_key)
+    if data_points is not None:
+        return data_points
+
+    if cache_key not in inflight_fetches:
+        task = asyncio.create_task(_list_aligned_series(project_id, start_time, end_time, full_filter, group_by_fields))
+        inflight_fetches[cache_key] = task
+        task.add_done_callback(lambda _: inflight_fetches.pop(cache_key, None))
+    # shield: a cancelled caller must not cancel the RPC other callers are waiting on
+    data_points = await asyncio.shield(inflight_fetches[cache_key])
+    if series_cache.getsizeof(data_points) <= series_cache.maxsize:  # larger entries would raise ValueError
+        series_cache[cache_key] = data_points
+    return data_points
+
+
+_point_end_seconds = attrgetter("interval.end_time.seconds")
+_point_int64 = attrgetter("value.int64_value")
+_point_double = attrgetter("value.double_value")
+
+
+async def _list_aligned_series(project_id, start_time, end_time, full_filter, group_by_fields):
+    project_name = f"projects/{project_id}"
     try:
-        results = monitoring_client.list_time_series(
+        results = await monitoring_client.list_time_series(
             request={
-                "name": project_name, "filter": full_filter, "interval": interval,
+                "name": project_name, "filter": full_filter, "interval": _time_interval(start_time, end_time),
                 "view": monitoring_v3.ListTimeSeriesRequest.TimeSeriesView.FULL,
-                "aggregation": aggregation
+                "aggregation": _aggregation(group_by_fields)
             }
         )
-        data_points = {}
-        for series in results:
-            for point in series.points:
-                ts = int(point.interval.end_time.timestamp())
-                val = getattr(point.value, 'double_value', 0) or getattr(point.value, 'int64_value', 0)
-                data_points[ts] = data_points.get(ts, 0) + val
-        return data_points
+        # "resource.labels.service_name" -> ("resource", "service_name")
+        label_paths = [(field.split(".")[0], field.split(".")[-1]) for field in group_by_fields]
+        n_minutes = (end_time - start_time) // 60
+        group_ids, bins, values = {}, [], []
+        async for series in results:
+            # Walk the raw protobuf so end_time.seconds is read directly instead of via a datetime wrapper
+            series = monitoring_v3.TimeSeries.pb(series)
+            key = tuple(getattr(series, kind).labels.get(label, "") for kind, label in label_paths)
+            gid = group_ids.setdefault(key, len(group_ids))
+            n = len(series.points)
+            idx = np.fromiter(map(_point_end_seconds, series.points), dtype=np.int64, count=n)
+            # Bin i is the minute starting at start_time + 60 * i, i.e. the point ending a minute later.
+            # The interval excludes start_time itself, so binning by end time would leave bin 0 empty
+            # and make results depend on where a fetch happened to start.
+            idx = (idx - start_time) // 60 - 1
+            in_range = (idx >= 0) & (idx < n_minutes)
+            bins.append(gid * n_minutes + idx[in_range])
+            read_value = _point_double if series.value_type == metric_pb2.MetricDescriptor.ValueType.DOUBLE else _point_int64
+            values.append(np.fromiter(map(read_value, series.points), dtype=np.float64, count=n)[in_range])
+
+        # Sum every (group, minute) bin across all series in one vectorized reduction
+        sums = np.bincount(np.concatenate(bins or [np.empty(0, dtype=np.int64)]),
+                           weights=np.concatenate(values or [np.empty(0)]),
+                           minlength=len(group_ids) * n_minutes)
+        # Request counts are whole numbers; bincount only sums weights as float64
+        sums = np.rint(sums).astype(COUNT_DTYPE)
+        return {key: sums[gid * n_minutes:(gid + 1) * n_minutes] for key, gid in group_ids.items()}
     except exceptions.NotFound:
         return {}
 
 
-def get_sla_metrics(project_id, service_type, service_name, start_time, end_time):
+def _uptime_from_arrays(total_arr, err_arr, total_mins):
+    """Counts minutes where every request failed and turns them into an uptime percentage."""
+    if not total_arr.any(): return 100.0, 0  # no traffic, nothing can have failed
+    # errors / total >= 1.0 is just errors >= total
+    downtime_minutes = int(np.count_nonzero((err_arr >= total_arr) & (total_arr > 0)))
+    uptime_pct = ((total_mins - downtime_minutes) / total_mins) * 100
+    return round(uptime_pct, 4), downtime_minutes
+
+
+@lru_cache(maxsize=256)
+def _service_query(service_type, service_names):
+    """Builds the (filter, group_by_fields) pair for a batch of services once; the same batches recur every report."""
+    conf = SERVICE_CONFIGS[service_type]
+    filter_base = conf['filter_tpl']
+    group_by = (f"metric.labels.{conf['status_label']}",)
+    if 'name_label' in conf:
+        # Only per-service resources interpolate names; project-scoped filters are used as-is
+        filter_base = filter_base.format(names=", ".join(f'"{name}"' for name in service_names))
+        group_by = (f"resource.labels.{conf['name_label']}",) + group_by
+    return f'metric.type="{conf["total_metric"]}" AND {filter_base}', group_by
+
+
+async def _fetch_service_arrays(project_id, service_type, service_names, start_time, end_time):
+    """Fetches per-minute total and error arrays for a batch of services of one type: {name: (total_arr, err_arr)}."""
+    conf = SERVICE_CONFIGS[service_type]
+    per_service = 'name_label' in conf
+    total_filter, group_by = _service_query(service_type, tuple(dict.fromkeys(service_names)))
+    n_minutes = (end_time - start_time) // 60
+
+    # One RPC per (project, service type) grouped by service and status; totals and errors are split locally
+    by_service_status = await fetch_aligned_series(project_id, start_time, end_time, total_filter, group_by)
+    if not by_service_status:
+        # NotFound or no traffic at all: every service shares one read-only zero series
+        zeros = np.zeros(n_minutes, dtype=COUNT_DTYPE)
+        zeros.flags.writeable = False
+        return {name: (zeros, zeros) for name in service_names}
+
+    # Project-scoped metrics (BigQuery) have no service label: all services share the project's series
+    series_names = service_names if per_service else [""]
+    total_arrs = {name: np.zeros(n_minutes, dtype=COUNT_DTYPE) for name in series_names}
+    err_arrs = {name: np.zeros(n_minutes, dtype=COUNT_DTYPE) for name in series_names}
+    for (*name, status), status_arr in by_service_status.items():
+        name = name[0] if per_service else ""
+        if name not in total_arrs: continue
+        total_arrs[name] += status_arr
+        is_error = status == conf['error_value'] if 'error_value' in conf else status != conf['success_value']
+        if is_error: err_arrs[name] += status_arr
+    if not per_service:
+        return {name: (total_arrs[""], err_arrs[""]) for name in service_names}
+    return {name: (total_arrs[name], err_arrs[name]) for name in total_arrs}
+
+
+def _cache_ref(project_id, service_type, name, day):
+    return db.collection(CACHE_COLLECTION_NAME).document(f"{project_id}_{service_type}_{name}_{day}")
+
+
+def _read_cached_days(project_id, service_type, service_names, days):
+    """Loads cached settled days as {(name, day): (total_arr, err_arr)}; missing days are simply absent."""
+    refs = [_cache_ref(project_id, service_type, name, day) for name in service_names for day in days]
+    cached = {}
+    for snap in db.get_all(refs):
+        if not snap.exists: continue
+        doc = snap.to_dict()
+        cached[(doc["service"], doc["day"])] = (np.frombuffer(doc["total"], dtype=doc["dtype"]),
+                                                np.frombuffer(doc["errors"], dtype=doc["dtype"]))
+    return cached
+
+
+def _write_cached_days(project_id, service_type, day_arrays):
+    """Persists {(name, day): (total_arr, err_arr)} day slices, committing at most 500 writes per batch."""
+    items = list(day_arrays.items())
+    for i in range(0, len(items), 500):
+        batch = db.batch()
+        for (name, day), (total_arr, err_arr) in items[i:i + 500]:
+            batch.set(_cache_ref(project_id, service_type, name, day), {
+                "service": name, "day": day, "dtype": total_arr.dtype.str,
+                "total": total_arr.tobytes(), "errors": err_arr.tobytes()
+            })
+        batch.commit()
+
+
+async def get_sla_metrics(project_id, service_type, service_names, start_time, end_time):
     """This Python function is a specialized tool for calculating the **Service Level Agreement (SLA) Uptime Percentage** for Google Cloud Platform (GCP) resources.
 
         Instead of just checking if a server is "up" or "down," it uses request metrics to determine if a service was effectively unavailable during specific one-minute windows.
@@ -80,7 +303,7 @@ def get_sla_metrics(project_id, service_type, service_name, start_time, end_time
 
         ### 1. Configuration Mapping
 
-        The function starts by defining how to talk to Google Cloud Monitoring for three specific services. It maps each `service_type` to its corresponding metric name and resource filter:
+        The function starts by looking up, in the module-level `SERVICE_CONFIGS`, how to talk to Google Cloud Monitoring for three specific services. It maps each `service_type` to its corresponding metric name and resource filter:
 
         | Service Type | Metric Tracked | "Bad" Outcome |
         | --- | --- | --- |
@@ -90,20 +313,24 @@ def get_sla_metrics(project_id, service_type, service_name, start_time, end_time
 
         ### 2. Data Fetching
 
-        It calls a helper function (presumably defined elsewhere) `fetch_aligned_series` to pull raw data for the specified time range. It fetches two sets of data:
+        It calls `_fetch_service_arrays` (which wraps `fetch_aligned_series`) to pull per-minute counts for the specified time range. It derives two sets of data:
 
         * **Total Data:** All requests/operations that occurred.
         * **Success/Error Data:** Specifically identifies the failed attempts (or successful ones for BigQuery).
 
+        Both come from a single request grouped by the status label (response code, or query state for BigQuery).
+        All `service_names` of one type are fetched together through a `one_of(...)` filter and split back out by resource label.
+        Fully ingested UTC days are cached in Firestore (`sla_cache`), so a refresh only asks Monitoring for the days it has not seen yet plus the live tail.
+
         ### 3. The "Downtime" Logic
 
-        This is the core of the function. It iterates through the time range in **60-second increments** (1-minute buckets).
+        This is the core of the function. The time range is laid out as NumPy arrays of **60-second increments** (1-minute buckets) and evaluated in a single vectorized pass.
 
         For each minute:
 
         1. **Check Activity:** If there were no requests (`total < 1`), the minute is ignored (it doesn't count as downtime).
-        2. **Calculate Error Rate:** It determines the ratio of errors to total requests.
-        3. **The "100% Failure" Rule:** A minute is only counted as `downtime_minutes` if **100% of requests failed** ().
+        2. **Compare Errors to Total:** No error ratio is computed; `errors >= total` already means every request failed, so no division is needed.
+        3. **The "100% Failure" Rule:** A minute is only counted as `downtime_minutes` if **100% of requests failed** (`errors >= total`).
 
         > **Note:** This is a strict SLA definition. If 99% of requests fail in a minute, this specific function still considers that minute "up."
         It only triggers downtime if the service is completely unresponsive or erroring for every single call.
@@ -113,7 +340,7 @@ def get_sla_metrics(project_id, service_type, service_name, start_time, end_time
         Finally, it converts that downtime into a percentage:
 
 
-        It returns the **percentage** (rounded to 4 decimal places) and the **total count of downtime minutes**.
+        It returns a `{service_name: (percentage, downtime_minutes)}` map, with the **percentage** rounded to 4 decimal places.
 
         ---
 
@@ -126,103 +353,196 @@ def get_sla_metrics(project_id, service_type, service_name, start_time, end_time
         * **1 minute:** 100% of requests failed (Result: **1 minute downtime**).
         * **Result:**  uptime.
 """
-    configs = {
-        'cloud_run_revision': {
-            'total_metric': 'run.googleapis.com/request_count',
-            'filter_base': f'resource.type="cloud_run_revision" AND resource.labels.service_name="{service_name}"',
-            'error_filter': 'metric.labels.response_code_class="5xx"'
-        },
-        'gcs_bucket': {
-            'total_metric': 'storage.googleapis.com/api/request_count',
-            'filter_base': f'resource.type="gcs_bucket" AND resource.labels.bucket_name="{service_name}"',
-            'error_filter': 'metric.labels.response_code="500"'
-        },
-        'bigquery_project': {
-            'total_metric': 'bigquery.googleapis.com/query/count',
-            'filter_base': 'resource.type="bigquery_project"',
-            'success_filter': 'metric.labels.state="SUCCEEDED"'
-        }
-    }
-    conf = configs[service_type]
-    total_filter = f'metric.type="{conf["total_metric"]}" AND {conf["filter_base"]}'
-    total_data = fetch_aligned_series(project_id, start_time, end_time, total_filter)
-    is_bq = (service_type == 'bigquery_project')
-
-    suc_data, err_data = {}, {}
-    if is_bq:
-        suc_filter = f'{total_filter} AND {conf["success_filter"]}'
-        suc_data = fetch_aligned_series(project_id, start_time, end_time, suc_filter)
-    else:
-        err_filter = f'{total_filter} AND {conf["error_filter"]}'
-        err_data = fetch_aligned_series(project_id, start_time, end_time, err_filter)
+    if service_type not in SERVICE_CONFIGS:
+        raise ValueError(f"unknown service type {service_type!r}")
+    service_names = list(dict.fromkeys(service_names))
+    total_mins = (end_time - start_time) // 60
+
+    # Whole UTC days that Monitoring has finished ingesting are cached; only the rest is refetched
+    day_origin = start_time - (start_time % DAY_SECONDS)
+    settled_days = list(range(day_origin, end_time - CACHE_SETTLE_SECONDS - DAY_SECONDS + 1, DAY_SECONDS))
+    cached = await asyncio.to_thread(_read_cached_days, project_id, service_type, service_names, settled_days)
+    missing = [day for day in settled_days if any((name, day) not in cached for name in service_names)]
+    fetch_start = missing[0] if missing else day_origin + len(settled_days) * DAY_SECONDS
+    fetched = await _fetch_service_arrays(project_id, service_type, service_names, fetch_start, end_time)
+
+    day_mins, window = DAY_SECONDS // 60, (start_time - day_origin) // 60
+    offset, n_minutes = (fetch_start - day_origin) // 60, (end_time - day_origin) // 60
+    results, new_days = {}, {}
+    for name, (fetched_total, fetched_err) in fetched.items():
+        total_arr = np.zeros(n_minutes, dtype=COUNT_DTYPE)
+        err_arr = np.zeros(n_minutes, dtype=COUNT_DTYPE)
+        total_arr[offset:], err_arr[offset:] = fetched_total, fetched_err
+        for day in settled_days:
+            i = (day - day_origin) // 60
+            if day < fetch_start:
+                total_arr[i:i + day_mins], err_arr[i:i + day_mins] = cached[(name, day)]
+            elif (name, day) not in cached:
+                new_days[(name, day)] = (total_arr[i:i + day_mins], err_arr[i:i + day_mins])
+        results[name] = _uptime_from_arrays(total_arr[window:], err_arr[window:], total_mins)
+
+    if new_days:
+        await asyncio.to_thread(_write_cached_days, project_id, service_type, new_days)
+    return results
 
-    downtime_minutes = 0
-    for t in range(int(start_time), int(end_time), 60):
-        total = total_data.get(t, 0)
-        if total < 1: continue
-        errors = (total - suc_data.get(t, 0)) if is_bq else err_data.get(t, 0)
-        if (errors / total) >= 1.0: downtime_minutes += 1
 
-    total_mins = (end_time - start_time) / 60
-    uptime_pct = ((total_mins - downtime_minutes) / total_mins) * 100
-    return round(uptime_pct, 4), downtime_minutes
+# --- Background Worker ---
 
+def _write_report(doc_ref, job):
+    """Writes one `projects/{project_id}` subdoc per project's metrics, at most 500 per batch, then the job doc."""
+    projects = job.get("data", [])
+    for i in range(0, len(projects), 500):
+        batch = db.batch()
+        for position, project in enumerate(projects[i:i + 500], start=i):
+            batch.set(doc_ref.collection("projects").document(project["project_id"]), {**project, "position": position})
+        batch.commit()
+    # Written last, so a listed job never points at missing subdocs
+    doc_ref.set({k: v for k, v in job.items() if k != "data"})
 
-# --- Background Worker ---
 
-def run_sla_task(job_id: str, request: ReportRequest):
-    doc_ref = db.collection(COLLECTION_NAME).document(job_id)
-    try:
-        end_ts = int(time.time())
-        start_ts = end_ts - (request.days * 24 * 60 * 60)
+def _read_report_data(doc_ref):
+    """Reassembles a report's `data` list from its per-project subdocs, in the order they were written."""
+    projects = sorted((snap.to_dict() for snap in doc_ref.collection("projects").stream()),
+                      key=lambda p: p.pop("position", 0))
+    return [{"project_id": p["project_id"], "metrics": p["metrics"]} for p in projects]
+
+
+def _read_recent_reports():
+    # Only listing fields are read; per-project results are fetched through the detail endpoint
+    docs = db.collection(COLLECTION_NAME).order_by("started_at", direction=firestore.Query.DESCENDING).limit(
+        10).select(REPORT_LIST_FIELDS).stream()
+    return [doc.to_dict() for doc in docs]
+
+
+def _read_report(job_id):
+    doc = db.collection(COLLECTION_NAME).document(job_id).get()
+    if not doc.exists: return None
+    report = doc.to_dict()
+    if report.get("status") == "completed" and "data" not in report:
+        report["data"] = _read_report_data(doc.reference)
+    return report
 
-        tasks = [(p.id, s) for p in request.projects for s in p.services]
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=request.max_workers) as executor:
-            futures = [executor.submit(lambda x: (
-            x[0], x[1].name, get_sla_metrics(x[0], x[1].type, x[1].name, start_ts, end_ts), x[1].threshold), t) for t in
-                       tasks]
-            results = [f.result() for f in concurrent.futures.as_completed(futures)]
+def _invalidate_report_list():
+    global report_list_generation
+    report_list_generation += 1
+    report_list_cache.clear()
 
-        formatted = {}
-        for pid, name, (uptime, mins), thresh in results:
-            if pid not in formatted: formatted[pid] = []
-            formatted[pid].append(
-                {"service": name, "uptime_pct": uptime, "downtime_minutes": mins, "compliant": uptime >= thresh})
 
-        doc_ref.update({
+async def _run_group(sem: asyncio.Semaphore, pid: str, service_type: str, services: List[ServiceConfig],
+                     start_ts: int, end_ts: int):
+    async with sem:
+        return await get_sla_metrics(pid, service_type, [s.name for s in services], start_ts, end_ts)
+
+
+async def run_sla_task(job_id: str, request: ReportRequest):
+    doc_ref = db.collection(COLLECTION_NAME).document(job_id)
+    job = pending_jobs[job_id]
+    try:
+        # The window is aligned once here; REPORT_BUCKET_SECONDS is a whole number of minutes, so
+        # both ends sit on the minute grid Monitoring aligns buckets to and are passed down as-is
+        end_ts = (int(time.time()) // REPORT_BUCKET_SECONDS) * REPORT_BUCKET_SECONDS
+        start_ts = end_ts - (request.days * DAY_SECONDS)
+
+        # At most max_workers (project, service type) groups run at once, each costing one Monitoring
+        # query plus its sla_cache reads and writes, to stay under the API's QPS quota
+        sem = asyncio.Semaphore(request.max_workers)
+
+        # One Monitoring query per (project, service type) covers every service of that type
+        groups = defaultdict(list)
+        for p in request.projects:
+            for s in p.services:
+                groups[(p.id, s.type)].append(s)
+
+        # A failing (project, type) query is reported on its services instead of failing the whole job
+        results = await asyncio.gather(
+            *[_run_group(sem, pid, t, svcs, start_ts, end_ts) for (pid, t), svcs in groups.items()],
+            return_exceptions=True)
+
+        # Results are assembled straight into the stored {"project_id", "metrics"} shape
+        data = {}
+        for ((pid, _), services), metrics in zip(groups.items(), results):
+            project_metrics = data.setdefault(pid, {"project_id": pid, "metrics": []})["metrics"]
+            for s in services:
+                if isinstance(metrics, BaseException):
+                    project_metrics.append({"service": s.name, "error": str(metrics)})
+                    continue
+                uptime, mins = metrics[s.name]
+                project_metrics.append(
+                    {"service": s.name, "uptime_pct": uptime, "downtime_minutes": mins, "compliant": uptime >= s.threshold})
+
+        job.update({
             "status": "completed",
             "finished_at": datetime.now().isoformat(),
-            "data": [{"project_id": k, "metrics": v} for k, v in formatted.items()]
+            "data": list(data.values())
         })
     except Exception as e:
-        doc_ref.update({"status": "failed", "error": str(e)})
+        job.update({"status": "failed", "error": str(e)})
+    try:
+        # The job is persisted once, when it reaches its final state; the blocking
+        # Firestore call runs on the default thread pool so other jobs' RPCs keep flowing
+        await asyncio.to_thread(_write_report, doc_ref, job)
+    except Exception as e:
+        logger.exception("Failed to save report %s", job_id)
+        job.update({"status": "failed", "error": f"report could not be saved: {e}"})
+        unsaved_reports[job_id] = job
+    else:
+        finished_reports[job_id] = job
+        _invalidate_report_list()
+    pending_jobs.pop(job_id, None)
 
 
 # --- API Endpoints ---
 
+# Endpoints stay on the event loop so pending_jobs and the report caches are only touched from
+# one thread; just the blocking Firestore reads are handed to the default thread pool
+
 @app.post("/v1/compliance_report", status_code=202)
-async def create_report(request: ReportRequest, background_tasks: BackgroundTasks):
+async def create_report(request: ReportRequest):
     job_id = str(uuid.uuid4())
-    db.collection(COLLECTION_NAME).document(job_id).set({
+    pending_jobs[job_id] = {
         "job_id": job_id, "status": "processing", "started_at": datetime.now().isoformat(), "days": request.days
-    })
-    background_tasks.add_task(run_sla_task, job_id, request)
+    }
+    task = asyncio.create_task(run_sla_task(job_id, request))
+    running_jobs.add(task)
+    task.add_done_callback(running_jobs.discard)
     return {"job_id": job_id}
 
 
 @app.get("/v1/compliance_report")
-async def list_reports():
-    docs = db.collection(COLLECTION_NAME).order_by("started_at", direction=firestore.Query.DESCENDING).limit(
-        10).stream()
-    return [doc.to_dict() for doc in docs]
+async def list_reports(request: Request, response: Response):
+    # Taken before the Firestore read: a job finishing during the read may be missing from its result
+    in_memory = [{k: j[k] for k in REPORT_LIST_FIELDS if k in j}
+                 for j in [*pending_jobs.values(), *unsaved_reports.values()]]
+    reports = report_list_cache.get("recent")
+    if reports is None:
+        generation = report_list_generation
+        reports = await asyncio.to_thread(_read_recent_reports)
+        # A report saved while reading would be missing from this result; don't cache it then
+        if generation == report_list_generation:
+            report_list_cache["recent"] = reports
+    in_memory_ids = {j["job_id"] for j in in_memory}
+    reports = sorted(in_memory + [r for r in reports if r["job_id"] not in in_memory_ids],
+                     key=lambda j: j["started_at"], reverse=True)[:10]
+
+    # Listed reports only ever change by appearing or changing status, so those fields identify the response
+    etag = 'W/"%s"' % hashlib.blake2b(repr([(r["job_id"], r["status"]) for r in reports]).encode(),
+                                      digest_size=8).hexdigest()
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return reports
 
 
 @app.get("/v1/compliance_report/{job_id}")
 async def get_report(job_id: str):
-    doc = db.collection(COLLECTION_NAME).document(job_id).get()
-    if not doc.exists: raise HTTPException(status_code=404)
-    return doc.to_dict()
+    report = pending_jobs.get(job_id) or unsaved_reports.get(job_id) or finished_reports.get(job_id)
+    if report is None:
+        report = await asyncio.to_thread(_read_report, job_id)
+        if report is None: raise HTTPException(status_code=404)
+        if report.get("status") in ("completed", "failed"):
+            finished_reports[job_id] = report
+    return ORJSONResponse(report)
 
 
 # --- Dashboard HTML ---
@@ -253,9 +573,20 @@ async def dashboard():
         </div>
 
         <script>
+            // Finished reports never change, so their details are fetched once per job
+            const reportDetails = {};
+
+            let reportsEtag = null;
+
             async function loadReports() {
-                const res = await fetch('/v1/compliance_report');
+                const res = await fetch('/v1/compliance_report', {headers: reportsEtag ? {'If-None-Match': reportsEtag} : {}});
+                if (res.status === 304) return;  // nothing changed since the last poll
+                reportsEtag = res.headers.get('ETag');
                 const reports = await res.json();
+                await Promise.all(reports.filter(r => r.status === 'completed' && !reportDetails[r.job_id]).map(async r => {
+                    reportDetails[r.job_id] = await (await fetch(`/v1/compliance_report/${r.job_id}`)).json();
+                }));
+                reports.forEach(r => { if (reportDetails[r.job_id]) r.data = reportDetails[r.job_id].data; });
                 const container = document.getElementById('reports-list');
                 container.innerHTML = reports.map(r => `
                     <div class="border-b pb-4">
@@ -279,7 +610,7 @@ async def dashboard():
                         <p class="font-bold text-sm">Project: ${p.project_id}</p>
                         <ul class="text-sm">
                             ${p.metrics.map(m => `
-                                <li>${m.compliant ? '✅' : '❌'} ${m.service}: ${m.uptime_pct}% (${m.downtime_minutes}m downtime)</li>
+                                <li>${m.error ? `⚠️ ${m.service}: ${m.error}` : `${m.compliant ? '✅' : '❌'} ${m.service}: ${m.uptime_pct}% (${m.downtime_minutes}m downtime)`}</li>
                             `).join('')}
                         </ul>
                     </div>
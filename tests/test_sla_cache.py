@@ -0,0 +1,133 @@
+import asyncio
+import sys
+from pathlib import Path
+from unittest import mock
+
+from google.api import metric_pb2
+from google.cloud import firestore, monitoring_v3
+from google.cloud.monitoring_v3.services.metric_service import transports
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+DAY = 24 * 60 * 60
+
+
+class FakeSnapshot:
+    def __init__(self, data):
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeDocRef:
+    def __init__(self, store, path):
+        self.store, self.path = store, path
+
+    def set(self, data):
+        self.store[self.path] = dict(data)
+
+    def get(self):
+        return FakeSnapshot(self.store.get(self.path))
+
+    def collection(self, name):
+        return FakeCollection(self.store, self.path + (name,))
+
+
+class FakeCollection:
+    def __init__(self, store, path):
+        self.store, self.path = store, path
+
+    def document(self, doc_id):
+        return FakeDocRef(self.store, self.path + (doc_id,))
+
+
+class FakeBatch:
+    def __init__(self):
+        self.writes = []
+
+    def set(self, ref, data):
+        self.writes.append((ref, data))
+
+    def commit(self):
+        for ref, data in self.writes:
+            ref.set(data)
+
+
+class FakeFirestore:
+    def __init__(self, *args, **kwargs):
+        self.store = {}
+
+    def collection(self, name):
+        return FakeCollection(self.store, (name,))
+
+    def get_all(self, refs):
+        return [ref.get() for ref in refs]
+
+    def batch(self):
+        return FakeBatch()
+
+
+class FakePager:
+    def __init__(self, series):
+        self.series = iter(series)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.series)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeMonitoring:
+    """Serves per-minute points by end time, honouring Monitoring's (start, end] interval semantics."""
+
+    def __init__(self, points):
+        self.points = points  # {(status, end_seconds): count}
+
+    async def list_time_series(self, request):
+        start = request["interval"].start_time.timestamp()
+        end = request["interval"].end_time.timestamp()
+        by_status = {}
+        for (status, t), count in sorted(self.points.items(), key=lambda item: item[0][1]):
+            if start < t <= end:
+                by_status.setdefault(status, []).append({
+                    "interval": {"start_time": {"seconds": t - 60}, "end_time": {"seconds": t}},
+                    "value": {"int64_value": count}})
+        return FakePager([monitoring_v3.TimeSeries({
+            "resource": {"labels": {"service_name": "svc"}},
+            "metric": {"labels": {"response_code_class": status}},
+            "value_type": metric_pb2.MetricDescriptor.ValueType.INT64,
+            "points": points}) for status, points in by_status.items()])
+
+
+with mock.patch.object(firestore, "Client", FakeFirestore), \
+        mock.patch.object(transports, "MetricServiceGrpcAsyncIOTransport", mock.MagicMock()), \
+        mock.patch.object(monitoring_v3, "MetricServiceAsyncClient", mock.MagicMock()):
+    import main
+
+
+def test_warm_refresh_matches_cold_run_at_day_boundary():
+    end = (1_700_000_000 // main.REPORT_BUCKET_SECONDS) * main.REPORT_BUCKET_SECONDS
+    start = end - 3 * DAY
+    day_origin = start - start % DAY
+    # First day a warm refresh fetches from Monitoring instead of sla_cache
+    warm_fetch_start = day_origin + ((end - main.CACHE_SETTLE_SECONDS - day_origin) // DAY) * DAY
+
+    # Steady traffic, with every request failing in the minutes ending at and right after that midnight
+    outage = {warm_fetch_start, warm_fetch_start + 60}
+    points = {("2xx", t): 10 for t in range(start + 60, end + 1, 600) if t not in outage}
+    points.update({("5xx", t): 4 for t in outage})
+    main.monitoring_client = FakeMonitoring(points)
+    main.db = FakeFirestore()
+
+    cold = asyncio.run(main.get_sla_metrics("prj", "cloud_run_revision", ["svc"], start, end))
+    main.series_cache.clear()
+    warm = asyncio.run(main.get_sla_metrics("prj", "cloud_run_revision", ["svc"], start, end))
+
+    assert cold == warm
+    assert cold["svc"][1] == 2